@@ -1,6 +1,7 @@
 __all__ = [
     "BotadsClient",
     "AsyncBotadsClient",
+    "CoalescingCodeIssuer",
     "verify_signature",
     "parse_webhook_payload",
     "WebhookPayload",
@@ -14,7 +15,7 @@ __all__ = [
 ]
 
 from .client import BotadsClient, CodeResponse
-from .async_client import AsyncBotadsClient
+from .async_client import AsyncBotadsClient, CoalescingCodeIssuer
 from .webhook import verify_signature, parse_webhook_payload, WebhookPayload
 from .errors import BotadsError, ApiError
 from .constants import (
@@ -0,0 +1,19 @@
+"""Internal JSON helpers.
+
+Uses orjson when available (install the ``botads-sdk[orjson]`` extra) and
+falls back to the stdlib. Both accept bytes directly, so callers can pass
+raw response/webhook bodies without an intermediate decode to str.
+"""
+
+try:
+    from orjson import dumps, loads
+except ImportError:  # pragma: no cover
+    import json as _json
+
+    loads = _json.loads
+
+    def dumps(obj):
+        return _json.dumps(obj).encode("utf-8")
+
+
+__all__ = ["dumps", "loads"]
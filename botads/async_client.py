@@ -1,11 +1,46 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import httpx
 
-from .errors import ApiError
+from ._json import dumps, loads
+from .errors import ApiError, BotadsError
 from .constants import DEFAULT_API_BASE_URL, DEFAULT_DIRECT_LINK_BASE_URL
 
+# Bound for the per-client code cache and how long before expiry a cached
+# code stops being served (so callers never receive an almost-dead code).
+_CODE_CACHE_MAX = 4096
+_CODE_CACHE_SAFETY_MARGIN = 5.0
+
+# Backoff schedule for 429/5xx responses.
+_RETRY_STATUS = frozenset((429, 500, 502, 503, 504))
+_RETRY_MAX = 3
+_RETRY_BASE = 0.2
+_RETRY_CAP = 5.0
+
+
+class AsyncRateLimiter:
+    """Keep the inter-request interval at or above 1/rps."""
+
+    def __init__(self, rps: float):
+        self._interval = 1.0 / rps
+        self._next_slot = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
 
 @dataclass
 class CodeResponse:
@@ -29,46 +64,259 @@ class AsyncBotadsClient:
         base_url: str = DEFAULT_API_BASE_URL,
         api_token: str = "",
         timeout: float = 10.0,
+        max_inflight: int = 32,
+        max_rps: Optional[float] = None,
     ):
         if not api_token:
             raise ValueError("api_token is required")
         self.base_url = base_url.rstrip("/")
         self.api_token = api_token
         self.timeout = timeout
-        self._client = httpx.AsyncClient(
-            headers={
-                "Authorization": f"Bearer {self.api_token}",
-                "Content-Type": "application/json",
-            },
-            timeout=timeout,
+        self.max_inflight = max_inflight
+        self._codes_url = f"{self.base_url}/client/v1/codes"
+        self._batch_url = f"{self.base_url}/client/v1/codes:batch"
+        self._rate_limiter = AsyncRateLimiter(max_rps) if max_rps else None
+        # Created lazily: asyncio primitives must be built inside a loop.
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._code_cache: "OrderedDict[Tuple[int, str], Tuple[CodeResponse, float]]" = (
+            OrderedDict()
         )
 
+    def _get_client(self) -> httpx.AsyncClient:
+        """Underlying httpx client, built lazily on first API call."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={
+                    "Authorization": f"Bearer {self.api_token}",
+                    "Content-Type": "application/json",
+                },
+                timeout=self.timeout,
+                # HTTP/2 multiplexes concurrent create_code calls over a single
+                # TCP/TLS connection instead of opening one per request. The
+                # settings live on the transport because httpx ignores
+                # client-level http2/limits when an explicit transport is given.
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=100,
+                        max_keepalive_connections=50,
+                        keepalive_expiry=30.0,
+                    ),
+                    retries=2,
+                ),
+            )
+        return self._client
+
+    async def _post(self, url: str, body: bytes) -> httpx.Response:
+        """POST with bounded concurrency, optional rate limiting, and
+        exponential backoff with jitter on 429/5xx (honoring Retry-After)."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_inflight)
+        for attempt in range(_RETRY_MAX + 1):
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire()
+            async with self._sem:
+                response = await self._get_client().post(url, content=body)
+            if (
+                response.status_code not in _RETRY_STATUS
+                or attempt == _RETRY_MAX
+            ):
+                return response
+            delay = min(_RETRY_CAP, _RETRY_BASE * (2 ** attempt))
+            delay += random.random() * _RETRY_BASE
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            await asyncio.sleep(delay)
+        return response
+
+    async def __aenter__(self) -> "AsyncBotadsClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
     async def create_code(self, bot_id: int, user_tg_id: str) -> CodeResponse:
-        payload = {"bot_id": str(bot_id), "user_tg_id": user_tg_id}
-        url = f"{self.base_url}/client/v1/codes"
-        response = await self._client.post(url, json=payload)
+        """Request a new short code.
+
+        Codes are cached until shortly before their expiry, so rapid repeated
+        calls for the same (bot_id, user_tg_id) skip the network round-trip.
+        """
+        key = (bot_id, user_tg_id)
+        cached = self._code_cache.get(key)
+        if cached is not None:
+            code, deadline = cached
+            if time.monotonic() < deadline - _CODE_CACHE_SAFETY_MARGIN:
+                self._code_cache.move_to_end(key)
+                return code
+            del self._code_cache[key]
+        # Serialize the body ourselves (orjson when available) and reuse the
+        # precomputed URL — skips httpx's internal json.dumps per call.
+        body = dumps({"bot_id": str(bot_id), "user_tg_id": user_tg_id})
+        response = await self._post(self._codes_url, body)
         if response.status_code != 200:
-            raise _parse_api_error(response)
-        data = response.json()
-        return CodeResponse(
+            raise ApiError.from_bytes(response.status_code, response.content)
+        data = loads(response.content)
+        code = CodeResponse(
             code=data["code"],
             expires_in=int(data["expires_in"]),
             expires_at=data["expires_at"],
         )
+        self._code_cache[key] = (code, time.monotonic() + code.expires_in)
+        if len(self._code_cache) > _CODE_CACHE_MAX:
+            self._code_cache.popitem(last=False)
+        return code
+
+    async def create_codes_batch(
+        self, requests: List[Tuple[int, str]]
+    ) -> List[CodeResponse]:
+        """Request several short codes in a single API call.
+
+        Posts to the codes:batch endpoint; raises ApiError if the server
+        does not support batching (e.g. 404).
+        """
+        body = dumps(
+            {
+                "requests": [
+                    {"bot_id": str(bot_id), "user_tg_id": user_tg_id}
+                    for bot_id, user_tg_id in requests
+                ]
+            }
+        )
+        response = await self._post(self._batch_url, body)
+        if response.status_code != 200:
+            raise ApiError.from_bytes(response.status_code, response.content)
+        data = loads(response.content)
+        return [
+            CodeResponse(
+                code=item["code"],
+                expires_in=int(item["expires_in"]),
+                expires_at=item["expires_at"],
+            )
+            for item in data["codes"]
+        ]
 
     async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class CoalescingCodeIssuer:
+    """Coalesce concurrent create_code calls into batched API requests.
+
+    Calls that arrive within a short window are drained together by a
+    background task and sent as one codes:batch request. If the server does
+    not support the batch endpoint, the issuer falls back to issuing the
+    drained calls concurrently over the wrapped client's connection pool.
+    """
+
+    def __init__(
+        self,
+        client: AsyncBotadsClient,
+        max_batch: int = 32,
+        batch_window: float = 0.005,
+    ):
+        self._client = client
+        self._max_batch = max_batch
+        self._batch_window = batch_window
+        # Created lazily: asyncio primitives must be built inside a loop.
+        self._queue: Optional["asyncio.Queue[Tuple[int, str, asyncio.Future]]"] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_supported = True
+
+    async def create_code(self, bot_id: int, user_tg_id: str) -> CodeResponse:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((bot_id, user_tg_id, future))
+        return await future
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # Fail anything enqueued but not yet picked up by the worker, so a
+        # create_code racing aclose never awaits an unresolved future.
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(BotadsError("issuer closed"))
         await self._client.aclose()
 
+    async def __aenter__(self) -> "CoalescingCodeIssuer":
+        return self
 
-def _parse_api_error(response: httpx.Response) -> ApiError:
-    try:
-        payload = response.json()
-    except Exception:
-        return ApiError(response.status_code, "UNKNOWN", response.text)
-    err = payload.get("error", {})
-    return ApiError(
-        response.status_code,
-        err.get("code", "UNKNOWN"),
-        err.get("message", "Unknown error"),
-        err.get("details"),
-    )
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self._batch_window
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), remaining)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception as exc:  # defensive: never leave futures unresolved
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    async def _flush(self, batch: List[Tuple[int, str, asyncio.Future]]) -> None:
+        if self._batch_supported and len(batch) > 1:
+            try:
+                codes = await self._client.create_codes_batch(
+                    [(bot_id, user_tg_id) for bot_id, user_tg_id, _ in batch]
+                )
+            except ApiError as exc:
+                if exc.status_code in (404, 405):
+                    self._batch_supported = False
+                else:
+                    for _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+                    return
+            except Exception:
+                # Transport-level failure (connect error, timeout, ...): fall
+                # through to the per-call path, which retries and resolves
+                # every future individually.
+                pass
+            else:
+                for (_, _, future), code in zip(batch, codes):
+                    if not future.done():
+                        future.set_result(code)
+                return
+        results = await asyncio.gather(
+            *(
+                self._client.create_code(bot_id, user_tg_id)
+                for bot_id, user_tg_id, _ in batch
+            ),
+            return_exceptions=True,
+        )
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
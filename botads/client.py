@@ -1,11 +1,22 @@
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional
+from functools import cached_property
+from typing import Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from ._json import dumps, loads
 from .errors import ApiError
 from .constants import DEFAULT_API_BASE_URL, DEFAULT_DIRECT_LINK_BASE_URL
 
+# Bound for the per-client code cache and how long before expiry a cached
+# code stops being served (so callers never receive an almost-dead code).
+_CODE_CACHE_MAX = 4096
+_CODE_CACHE_SAFETY_MARGIN = 5.0
+
 
 @dataclass
 class CodeResponse:
@@ -35,41 +46,78 @@ class BotadsClient:
         self.base_url = base_url.rstrip("/")
         self.api_token = api_token
         self.timeout = timeout
-        self._session = requests.Session()
-        self._session.headers.update(
+        self._codes_url = f"{self.base_url}/client/v1/codes"
+        self._code_cache: "OrderedDict[Tuple[int, str], Tuple[CodeResponse, float]]" = (
+            OrderedDict()
+        )
+
+    @cached_property
+    def session(self) -> requests.Session:
+        """Underlying session, built lazily on first API call."""
+        session = requests.Session()
+        session.headers.update(
             {
                 "Authorization": f"Bearer {self.api_token}",
                 "Content-Type": "application/json",
             }
         )
+        # Keep connections alive across calls: the default pool size (10)
+        # forces fresh TCP+TLS handshakes under bursts of create_code calls.
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=frozenset(["POST"]),
+                # Return the final response once retries are exhausted instead
+                # of raising RetryError, so callers still get an ApiError.
+                raise_on_status=False,
+            ),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def __enter__(self) -> "BotadsClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
 
     def create_code(self, bot_id: int, user_tg_id: str) -> CodeResponse:
-        """Request a new short code."""
-        payload = {"bot_id": str(bot_id), "user_tg_id": user_tg_id}
-        url = f"{self.base_url}/client/v1/codes"
-        response = self._session.post(url, json=payload, timeout=self.timeout)
+        """Request a new short code.
+
+        Codes are cached until shortly before their expiry, so rapid repeated
+        calls for the same (bot_id, user_tg_id) skip the network round-trip.
+        """
+        key = (bot_id, user_tg_id)
+        cached = self._code_cache.get(key)
+        if cached is not None:
+            code, deadline = cached
+            if time.monotonic() < deadline - _CODE_CACHE_SAFETY_MARGIN:
+                self._code_cache.move_to_end(key)
+                return code
+            del self._code_cache[key]
+        # Serialize the body ourselves (orjson when available) and reuse the
+        # precomputed URL — skips requests' internal json.dumps per call.
+        body = dumps({"bot_id": str(bot_id), "user_tg_id": user_tg_id})
+        response = self.session.post(self._codes_url, data=body, timeout=self.timeout)
         if response.status_code != 200:
-            raise _parse_api_error(response)
-        data = response.json()
-        return CodeResponse(
+            raise ApiError.from_bytes(response.status_code, response.content)
+        data = loads(response.content)
+        code = CodeResponse(
             code=data["code"],
             expires_in=int(data["expires_in"]),
             expires_at=data["expires_at"],
         )
+        self._code_cache[key] = (code, time.monotonic() + code.expires_in)
+        if len(self._code_cache) > _CODE_CACHE_MAX:
+            self._code_cache.popitem(last=False)
+        return code
 
     def close(self) -> None:
-        self._session.close()
-
-
-def _parse_api_error(response: requests.Response) -> ApiError:
-    try:
-        payload = response.json()
-    except Exception:
-        return ApiError(response.status_code, "UNKNOWN", response.text)
-    err = payload.get("error", {})
-    return ApiError(
-        response.status_code,
-        err.get("code", "UNKNOWN"),
-        err.get("message", "Unknown error"),
-        err.get("details"),
-    )
+        session = self.__dict__.pop("session", None)
+        if session is not None:
+            session.close()
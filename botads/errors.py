@@ -1,5 +1,7 @@
 from typing import Any, Optional
 
+from ._json import loads
+
 
 class BotadsError(Exception):
     """Base error for SDK."""
@@ -13,5 +15,20 @@ class ApiError(BotadsError):
         self.message = message
         self.details = details
 
+    @classmethod
+    def from_bytes(cls, status_code: int, body: bytes) -> "ApiError":
+        """Build an ApiError from a raw error-response body."""
+        try:
+            payload = loads(body)
+        except Exception:
+            return cls(status_code, "UNKNOWN", body.decode(errors="replace"))
+        err = payload.get("error", {})
+        return cls(
+            status_code,
+            err.get("code", "UNKNOWN"),
+            err.get("message", "Unknown error"),
+            err.get("details"),
+        )
+
     def __str__(self) -> str:
         return f"{self.status_code} {self.code}: {self.message}"
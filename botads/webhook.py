@@ -1,22 +1,44 @@
-import json
 import hmac
 import hashlib
 from dataclasses import dataclass
 from typing import Any, Dict
 
+from ._json import loads
+
+
+# Encoded key bytes per token. Webhook handlers verify with the same one or
+# two tokens per process, so this stays tiny; bounded as a safety net.
+_token_bytes_cache: Dict[str, bytes] = {}
+_TOKEN_CACHE_MAX = 16
+
+
+def _token_bytes(api_token: str) -> bytes:
+    key = _token_bytes_cache.get(api_token)
+    if key is None:
+        if len(_token_bytes_cache) >= _TOKEN_CACHE_MAX:
+            _token_bytes_cache.clear()
+        key = api_token.encode("utf-8")
+        _token_bytes_cache[api_token] = key
+    return key
+
 
 def verify_signature(body: bytes, signature_header: str, api_token: str) -> bool:
     """
     Verify HMAC SHA-256 signature for webhook payload.
 
     signature_header is expected in format "sha256=<hex>".
+    Comparison is constant-time via hmac.compare_digest.
     """
     if not signature_header or not signature_header.startswith("sha256="):
         return False
-    provided = signature_header.split("=", 1)[1]
-    mac = hmac.new(api_token.encode("utf-8"), body, hashlib.sha256)
-    expected = mac.hexdigest()
-    return hmac.compare_digest(provided, expected)
+    try:
+        provided = bytes.fromhex(signature_header.split("=", 1)[1])
+    except ValueError:
+        return False
+    # Compare the raw 32-byte digest instead of hex-encoding it: avoids a
+    # 64-char string allocation per call and stays constant-time.
+    expected = hmac.new(_token_bytes(api_token), body, hashlib.sha256).digest()
+    return hmac.compare_digest(expected, provided)
 
 
 @dataclass
@@ -28,7 +50,7 @@ class WebhookPayload:
 
 def parse_webhook_payload(body: bytes) -> WebhookPayload:
     """Parse webhook JSON body into a typed payload."""
-    payload = json.loads(body.decode("utf-8"))
+    payload = loads(body)
     event = payload.get("event")
     user_tg_id = payload.get("user_tg_id")
     if not event or not user_tg_id:
@@ -1,6 +1,9 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 
 from botads import (
     AsyncBotadsClient,
@@ -11,8 +14,39 @@ from botads import (
 BOT_API_TOKEN = os.getenv("BOT_API_TOKEN", "BOT_API_TOKEN")
 BOT_ID = os.getenv("BOT_ID", "123456789")
 
-app = FastAPI()
-client = AsyncBotadsClient(api_token=BOT_API_TOKEN)
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger("botads.example")
+
+# Handlers enqueue log records instead of writing to stdout inline, so the
+# request path never blocks on I/O; a background task drains the queue.
+# Created in the lifespan because asyncio primitives must be built in a loop.
+_log_queue: "asyncio.Queue[dict]" = None  # type: ignore[assignment]
+
+
+async def _drain_log_queue() -> None:
+    while True:
+        item = await _log_queue.get()
+        log.info("%s", item)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _log_queue
+    _log_queue = asyncio.Queue(maxsize=10_000)
+    drain_task = asyncio.create_task(_drain_log_queue())
+    # Create the client under the running event loop and share one
+    # connection pool across all requests.
+    async with AsyncBotadsClient(api_token=BOT_API_TOKEN) as client:
+        app.state.botads = client
+        yield
+    drain_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def get_botads(request: Request) -> AsyncBotadsClient:
+    return request.app.state.botads
 
 
 @app.get("/health")
@@ -20,7 +54,7 @@ async def health():
     return {"status": "ok"}
 
 
-async def issue_short_code(user_tg_id: str):
+async def issue_short_code(client: AsyncBotadsClient, user_tg_id: str):
     """Example helper to request a short code."""
     return await client.create_code(bot_id=BOT_ID, user_tg_id=user_tg_id)
 
@@ -30,6 +64,7 @@ async def webhook(
     request: Request,
     x_signature: str = Header(default=""),
     x_bot_id: str = Header(default=""),
+    client: AsyncBotadsClient = Depends(get_botads),
 ):
     body = await request.body()
     if BOT_ID and x_bot_id and BOT_ID != x_bot_id:
@@ -38,13 +73,10 @@ async def webhook(
         raise HTTPException(status_code=401, detail="invalid signature")
     payload = parse_webhook_payload(body)
     # process payload.event / payload.user_tg_id / payload.data
-    print(
-        {"event": payload.event, "user_tg_id": payload.user_tg_id, "data": payload.data},
-        flush=True,
-    )
+    try:
+        _log_queue.put_nowait(
+            {"event": payload.event, "user_tg_id": payload.user_tg_id, "data": payload.data}
+        )
+    except asyncio.QueueFull:
+        pass  # drop the record rather than block the hot path
     return {"status": "ok"}
-
-
-@app.on_event("shutdown")
-async def shutdown():
-    await client.aclose()
@@ -13,16 +13,21 @@ Run:
   pip install -r requirements.txt
   python main.py
 
-Make sure to expose the Flask server publicly (TLS required for Telegram) and configure
-webhooks to point at the endpoints defined below.
+`python main.py` registers the Telegram webhook and then execs gunicorn with
+gevent workers (the single-threaded Werkzeug dev server would serialize
+concurrent webhooks). Make sure to expose the server publicly (TLS required
+for Telegram) and configure webhooks to point at the endpoints defined below.
 """
 from __future__ import annotations
 
 import logging
 import os
+import threading
 import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Optional
 
 from flask import Flask, abort, request
 from telebot import TeleBot, types
@@ -42,6 +47,11 @@ try:
 except ImportError:  # pragma: no cover
     load_dotenv = None
 
+try:
+    from orjson import loads as json_loads
+except ImportError:  # pragma: no cover
+    from json import loads as json_loads
+
 if load_dotenv:
     load_dotenv()
 
@@ -69,6 +79,7 @@ except ValueError as exc:
 MINIAPP_URL = os.getenv("MINIAPP_URL", "https://miniapp.example/launch")
 
 FORCE_AD_INTERVAL_SECONDS = 5 * 60  # require ad watch once per 5 minutes
+MAX_USERS = int(os.getenv("MAX_USERS", "100000"))  # cap for the in-memory LRU of user states
 
 # Telegram copy
 AD_PROMPT_TEXT = "Чтобы выполнить действие, подтвердите просмотр рекламы (5 сек) 👇"
@@ -78,6 +89,7 @@ ACTION_RESULT_TEXT = (
     "🎉 Действие выполнено.\n"
     "(Демо-результат; в реальном боте тут могла быть ваша фича/контент.)"
 )
+UNLOCK_RESULT_TEXT = f"{UNLOCKED_TEXT}\n{ACTION_RESULT_TEXT}"
 
 
 # --- State -------------------------------------------------------------------
@@ -87,20 +99,29 @@ class UserState:
     last_unlock_ts: float = 0.0
     direct_link_message_id: Optional[int] = None
     pending_mode: Optional[str] = None  # "rewarded" or "direct_link"
-    ad_message_ids: list[int] = field(default_factory=list)
+    ad_message_ids: set[int] = field(default_factory=set)
 
 
-users_state: Dict[int, UserState] = {}
+# LRU keyed by user id: least-recently-seen users are evicted once MAX_USERS
+# is reached, keeping memory bounded on popular bots. The lock guards eviction
+# because Flask's dev server handles requests from multiple threads.
+users_state: "OrderedDict[int, UserState]" = OrderedDict()
+users_state_lock = threading.Lock()
 
 
 def get_state(user_id: int, chat_id: Optional[int] = None) -> UserState:
-    state = users_state.get(user_id)
-    if not state:
-        if chat_id is None:
-            raise KeyError(f"State for user {user_id} not found")
-        state = UserState(chat_id=chat_id)
-        users_state[user_id] = state
-    elif chat_id and state.chat_id != chat_id:
+    with users_state_lock:
+        state = users_state.get(user_id)
+        if not state:
+            if chat_id is None:
+                raise KeyError(f"State for user {user_id} not found")
+            state = UserState(chat_id=chat_id)
+            users_state[user_id] = state
+            if len(users_state) > MAX_USERS:
+                users_state.popitem(last=False)
+        else:
+            users_state.move_to_end(user_id)
+    if chat_id and state.chat_id != chat_id:
         state.chat_id = chat_id
     return state
 
@@ -147,9 +168,11 @@ def handle_protected_action(message: types.Message) -> None:
     send_ad_prompt(state)
 
 
-def send_ad_prompt(state: UserState) -> None:
+@lru_cache(maxsize=8192)
+def build_ad_keyboard(chat_id: int) -> types.InlineKeyboardMarkup:
+    """Build the ad-prompt keyboard once per chat; only chat_id varies."""
     keyboard = types.InlineKeyboardMarkup()
-    miniapp_url = f"{MINIAPP_URL}?user_tg_id={state.chat_id}"
+    miniapp_url = f"{MINIAPP_URL}?user_tg_id={chat_id}"
     keyboard.add(
         types.InlineKeyboardButton(
             "Смотреть рекламу",
@@ -157,10 +180,16 @@ def send_ad_prompt(state: UserState) -> None:
         )
     )
     keyboard.add(
-        types.InlineKeyboardButton("Пропустить", callback_data=f"skip:{state.chat_id}")
+        types.InlineKeyboardButton("Пропустить", callback_data=f"skip:{chat_id}")
+    )
+    return keyboard
+
+
+def send_ad_prompt(state: UserState) -> None:
+    sent = bot.send_message(
+        state.chat_id, AD_PROMPT_TEXT, reply_markup=build_ad_keyboard(state.chat_id)
     )
-    sent = bot.send_message(state.chat_id, AD_PROMPT_TEXT, reply_markup=keyboard)
-    state.ad_message_ids.append(sent.message_id)
+    state.ad_message_ids.add(sent.message_id)
     state.pending_mode = "rewarded"
     log.info("Requested ad for user %s", state.chat_id)
 
@@ -180,10 +209,7 @@ def send_direct_link(state: UserState) -> None:
             bot.delete_message(state.chat_id, state.direct_link_message_id)
         except ApiException:
             pass  # message might already be gone
-        try:
-            state.ad_message_ids.remove(state.direct_link_message_id)
-        except ValueError:
-            pass
+        state.ad_message_ids.discard(state.direct_link_message_id)
 
     url = code.direct_link
     sent = bot.send_message(
@@ -194,7 +220,7 @@ def send_direct_link(state: UserState) -> None:
         disable_web_page_preview=True,
     )
     state.direct_link_message_id = sent.message_id
-    state.ad_message_ids.append(sent.message_id)
+    state.ad_message_ids.add(sent.message_id)
     state.pending_mode = "direct_link"
     log.info("Sent direct link %s to user %s", url, state.chat_id)
 
@@ -206,14 +232,14 @@ def unlock_user(user_id: int, reason: str) -> None:
         return
     state.last_unlock_ts = time.time()
     state.pending_mode = None
-    for msg_id in list(state.ad_message_ids):
+    for msg_id in state.ad_message_ids.copy():
         try:
             bot.delete_message(state.chat_id, msg_id)
         except ApiException:
             pass
     state.ad_message_ids.clear()
     state.direct_link_message_id = None
-    bot.send_message(state.chat_id, f"{UNLOCKED_TEXT}\n{ACTION_RESULT_TEXT}")
+    bot.send_message(state.chat_id, UNLOCK_RESULT_TEXT)
     log.info("Unlocked user %s via %s", user_id, reason)
 
 
@@ -245,7 +271,6 @@ def handle_reset_ad(message: types.Message) -> None:
     bot.send_message(message.chat.id, "Таймер сброшен. Следующий /bonus снова потребует рекламу.")
 
 
-@bot.callback_query_handler(func=lambda call: call.data.startswith("skip:"))
 def handle_skip(call: types.CallbackQuery) -> None:
     bot.answer_callback_query(call.id, "Готовим рекламную ссылку…")
     user_id = call.from_user.id
@@ -253,6 +278,23 @@ def handle_skip(call: types.CallbackQuery) -> None:
     send_direct_link(state)
 
 
+def handle_unknown_callback(call: types.CallbackQuery) -> None:
+    bot.answer_callback_query(call.id)
+
+
+# Dispatch callback queries by "<prefix>:..." in one hash lookup instead of
+# registering a startswith lambda per prefix.
+CALLBACK_HANDLERS = {
+    "skip": handle_skip,
+}
+
+
+@bot.callback_query_handler(func=lambda _: True)
+def dispatch_callback(call: types.CallbackQuery) -> None:
+    prefix = (call.data or "").split(":", 1)[0]
+    CALLBACK_HANDLERS.get(prefix, handle_unknown_callback)(call)
+
+
 @bot.message_handler(func=lambda _: True)
 def fallback(message: types.Message) -> None:
     bot.send_message(
@@ -268,7 +310,9 @@ def telegram_webhook():
         header = request.headers.get("X-Telegram-Bot-Api-Secret-Token")
         if header != TELEGRAM_SECRET_TOKEN:
             return "forbidden", 403
-    update = types.Update.de_json(request.data.decode("utf-8"))
+    # de_json accepts a dict, so parse the raw bytes once (orjson when
+    # available) instead of decode-to-str + stdlib re-parse inside telebot.
+    update = types.Update.de_json(json_loads(request.get_data()))
     bot.process_new_updates([update])
     return "ok"
 
@@ -291,11 +335,27 @@ def botads_webhook():
 
 
 def main() -> None:
+    """Configure the Telegram webhook and serve via gunicorn + gevent.
+
+    Werkzeug's dev server (app.run) handles requests on a single thread, so
+    concurrent Telegram and Botads webhooks serialize. Gevent workers give
+    per-request I/O concurrency. Keep workers at 1 unless you move
+    users_state out of process memory — it is not shared between workers.
+    """
     configure_telegram_webhook()
-    ssl_context = None
+    argv = [
+        "gunicorn",
+        "--worker-class", "gevent",
+        "--workers", os.getenv("WEB_CONCURRENCY", "1"),
+        "--bind", f"{WEBHOOK_LISTEN_HOST}:{WEBHOOK_LISTEN_PORT}",
+    ]
     if WEBHOOK_TLS_CERT_FILE and WEBHOOK_TLS_KEY_FILE:
-        ssl_context = (WEBHOOK_TLS_CERT_FILE, WEBHOOK_TLS_KEY_FILE)
-    app.run(host=WEBHOOK_LISTEN_HOST, port=WEBHOOK_LISTEN_PORT, ssl_context=ssl_context)
+        argv += [
+            "--certfile", WEBHOOK_TLS_CERT_FILE,
+            "--keyfile", WEBHOOK_TLS_KEY_FILE,
+        ]
+    argv.append("main:app")
+    os.execvp("gunicorn", argv)
 
 
 if __name__ == "__main__":
@@ -55,6 +55,32 @@ class TestSDK(unittest.TestCase):
         self.assertEqual(code.direct_link, f"{DEFAULT_DIRECT_LINK_BASE_URL}/AAATEST")
         self.assertEqual(code.direct_link_url("https://example.com/"), "https://example.com/AAATEST")
 
+    def test_sync_client_code_cache(self) -> None:
+        class FakeResponse:
+            status_code = 200
+            content = b'{"code":"AAATEST","expires_in":3600,"expires_at":"2025-01-01T00:00:00Z"}'
+
+        class FakeSession:
+            def __init__(self) -> None:
+                self.calls = 0
+
+            def post(self, url, data=None, timeout=None):
+                self.calls += 1
+                return FakeResponse()
+
+            def close(self) -> None:
+                pass
+
+        session = FakeSession()
+        with BotadsClient(api_token="token") as client:
+            client.session = session
+            first = client.create_code(1, "42")
+            second = client.create_code(1, "42")
+            client.create_code(1, "43")
+        self.assertEqual(first.code, "AAATEST")
+        self.assertIs(first, second)
+        self.assertEqual(session.calls, 2)
+
     def test_sync_client_default_base_url(self) -> None:
         client = BotadsClient(api_token="token")
         try:
@@ -66,6 +92,66 @@ class TestSDK(unittest.TestCase):
         with self.assertRaises(ValueError):
             BotadsClient()
 
+    def test_coalescing_issuer_falls_back_to_gather(self) -> None:
+        from botads import CoalescingCodeIssuer
+        from botads.errors import ApiError
+
+        class FakeAsyncClient:
+            def __init__(self) -> None:
+                self.batch_calls = 0
+                self.single_calls = 0
+
+            async def create_codes_batch(self, requests):
+                self.batch_calls += 1
+                raise ApiError(404, "NOT_FOUND", "no batch endpoint")
+
+            async def create_code(self, bot_id, user_tg_id):
+                self.single_calls += 1
+                return CodeResponse(
+                    code=f"C{user_tg_id}", expires_in=3600, expires_at="2025-01-01T00:00:00Z"
+                )
+
+            async def aclose(self) -> None:
+                pass
+
+        async def run() -> None:
+            fake = FakeAsyncClient()
+            async with CoalescingCodeIssuer(fake) as issuer:
+                codes = await asyncio.gather(
+                    issuer.create_code(1, "1"),
+                    issuer.create_code(1, "2"),
+                    issuer.create_code(1, "3"),
+                )
+            self.assertEqual([c.code for c in codes], ["C1", "C2", "C3"])
+            self.assertEqual(fake.single_calls, 3)
+
+        asyncio.run(run())
+
+    def test_coalescing_issuer_survives_transport_errors(self) -> None:
+        from botads import CoalescingCodeIssuer
+
+        class FakeAsyncClient:
+            async def create_codes_batch(self, requests):
+                raise ConnectionError("boom")
+
+            async def create_code(self, bot_id, user_tg_id):
+                return CodeResponse(
+                    code=f"C{user_tg_id}", expires_in=3600, expires_at="2025-01-01T00:00:00Z"
+                )
+
+            async def aclose(self) -> None:
+                pass
+
+        async def run() -> None:
+            async with CoalescingCodeIssuer(FakeAsyncClient()) as issuer:
+                codes = await asyncio.gather(
+                    issuer.create_code(1, "1"),
+                    issuer.create_code(1, "2"),
+                )
+            self.assertEqual([c.code for c in codes], ["C1", "C2"])
+
+        asyncio.run(run())
+
     def test_async_client_default_base_url(self) -> None:
         client = AsyncBotadsClient(api_token="token")
         try: